@@ -1,49 +1,72 @@
+import asyncio
 import os
+import re
 from datetime import datetime
-from typing import Optional, Dict, List, Any
+from functools import lru_cache
+from typing import Optional, Dict, FrozenSet, List, Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-import pytz  # Required: pip install pytz
-import requests
+import httpx
+import orjson
+from cachetools import TTLCache
 from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 import json
 from typing import Optional
 from pydantic import BaseModel
 
+# TODO(robert): Hide this behind a config flag
+APPLY_BUSINESS_HOURS_FILTER = False
 
-def convert_duration_ms_to_label(duration_ms_str: str) -> str:
+# startMillisUtc values per duration from HubSpot, keyed by "avail:{slug}:{timezone}"
+AVAILABILITY_CACHE_TTL_SECONDS = 60
+_availability_cache: TTLCache = TTLCache(maxsize=1024, ttl=AVAILABILITY_CACHE_TTL_SECONDS)
+# Formatted slots, keyed by "slots:{slug}:{timezone}:{apply_business_hours_filter}:{limit}"
+_processed_availability_cache: TTLCache = TTLCache(maxsize=4096, ttl=AVAILABILITY_CACHE_TTL_SECONDS)
+# HubSpot loads currently in progress, keyed like _availability_cache, so concurrent misses for one
+# slug and timezone share a single upstream call whatever their limit
+_inflight: Dict[str, asyncio.Task] = {}
+# Bumped per slug on every booking; loads that started under an older generation don't write back to the caches
+_availability_generations: Dict[str, int] = {}
+
+# English day names indexed by datetime.weekday(), so slot labels don't depend on the process locale
+_DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+@lru_cache(maxsize=256)
+def get_tz(name: str) -> Optional[ZoneInfo]:
+    # Returns None for unknown or malformed IANA names so callers can answer with a 400
     try:
-        milliseconds = int(duration_ms_str)
-        if milliseconds < 0:
-            raise ValueError("Duration in milliseconds cannot be negative.")
-        minutes = milliseconds // (1000 * 60)
-        return f"{minutes}min"
-    except ValueError:
-        return "UnknownDuration"
-    except TypeError:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=32)
+def convert_duration_ms_to_label(duration_ms_str: str) -> str:
+    # HubSpot only ever sends a handful of well-formed keys ("900000", "1800000", ...)
+    if not isinstance(duration_ms_str, str):
         return "InvalidDurationFormat"
+    if not duration_ms_str.isdecimal():
+        return "UnknownDuration"
+    return f"{int(duration_ms_str) // (1000 * 60)}min"
+
+
+_DEFAULT_WORK_DAYS = frozenset({0, 1, 2, 3, 4})  # Monday to Friday (Monday=0, Sunday=6)
 
 
 def is_within_business_hours(
         dt_obj: datetime,
         start_hour: int = 9,
         end_hour: int = 17,
-        work_days: Optional[List[int]] = None
+        work_days: Optional[FrozenSet[int]] = None
 ) -> bool:
-    if work_days is None:
-        work_days = [0, 1, 2, 3, 4]  # Monday to Friday (Monday=0, Sunday=6)
-    if dt_obj.weekday() not in work_days:
-        return False
-    return start_hour <= dt_obj.hour < end_hour
+    return (dt_obj.weekday() in (_DEFAULT_WORK_DAYS if work_days is None else work_days)
+            and start_hour <= dt_obj.hour < end_hour)
 
 
-def process_hubspot_availability(
-        hubspot_response_json: Dict[str, Any],
-        target_timezone: str,
-        business_start_hour: int = 9,
-        business_end_hour: int = 17,
-        business_work_days: Optional[List[int]] = None
-) -> Dict[str, List[str]]:
-    transformed_availability: Dict[str, List[str]] = {}
+def extract_hubspot_start_millis(hubspot_response_json: Dict[str, Any]) -> Dict[str, List[float]]:
+    # Keep only startMillisUtc per duration key; the rest of the availability page is never read
     link_availability_data = hubspot_response_json.get("linkAvailability", {})
     availability_by_duration = link_availability_data.get("linkAvailabilityByDuration", {})
 
@@ -51,32 +74,36 @@ def process_hubspot_availability(
         print("Warning: 'linkAvailabilityByDuration' is not a dictionary or is missing.")
         return {}
 
-    try:
-        target_tz_obj = pytz.timezone(target_timezone)  # Validate and cache timezone object once
-    except pytz.exceptions.UnknownTimeZoneError:
-        # This error should be caught before calling this function if validating early
-        raise ValueError(f"Unknown or invalid timezone: {target_timezone}")
+    return {
+        duration_ms_str: [
+            slot["startMillisUtc"] for slot in details.get("availabilities", [])
+            if isinstance(slot, dict) and isinstance(slot.get("startMillisUtc"), (int, float))
+        ]
+        for duration_ms_str, details in availability_by_duration.items()
+        if isinstance(details, dict)
+    }
 
-    for duration_ms_str, details in availability_by_duration.items():
-        duration_label = convert_duration_ms_to_label(duration_ms_str)
-        available_slots_formatted: List[str] = []
 
-        if not isinstance(details, dict):
-            continue
+def process_hubspot_availability(
+        start_millis_by_duration: Dict[str, List[float]],
+        target_tz_obj: ZoneInfo,
+        business_start_hour: int = 9,
+        business_end_hour: int = 17,
+        business_work_days: Optional[FrozenSet[int]] = None,
+        apply_business_hours_filter: bool = APPLY_BUSINESS_HOURS_FILTER,
+        limit: Optional[int] = None
+) -> Dict[str, List[str]]:
+    transformed_availability: Dict[str, List[str]] = {}
 
-        for slot in details.get("availabilities", []):
-            if not isinstance(slot, dict):
-                continue
-            start_millis = slot.get("startMillisUtc")
-            if start_millis is None or not isinstance(start_millis, (int, float)):
-                continue
+    for duration_ms_str, start_millis_values in start_millis_by_duration.items():
+        duration_label = convert_duration_ms_to_label(duration_ms_str)
+        available_slots_formatted: List[str] = []
 
+        for start_millis in start_millis_values:
             try:
-                utc_dt = datetime.fromtimestamp(start_millis / 1000.0, tz=pytz.utc)
-                local_dt = utc_dt.astimezone(target_tz_obj)
+                # Convert straight into the target zone instead of building a UTC datetime first
+                local_dt = datetime.fromtimestamp(start_millis / 1000.0, tz=target_tz_obj)
 
-                # TODO(robert): Hide this behind a config flag
-                apply_business_hours_filter = False
                 if apply_business_hours_filter:
                     if not is_within_business_hours(
                             local_dt,
@@ -86,9 +113,13 @@ def process_hubspot_availability(
                     ):
                         continue
 
-                formatted_slot_time = local_dt.strftime("%A %Y-%m-%d %H:%M")
+                # Same output as strftime("%A %Y-%m-%d %H:%M") without the per-call locale lookup
+                formatted_slot_time = (f"{_DAYS[local_dt.weekday()]} {local_dt.year:04d}-{local_dt.month:02d}-"
+                                       f"{local_dt.day:02d} {local_dt.hour:02d}:{local_dt.minute:02d}")
                 available_slots_formatted.append(formatted_slot_time)
-            except (ValueError, TypeError) as e:
+                if len(available_slots_formatted) == limit:
+                    break  # Callers only display the first `limit` slots per duration
+            except (ValueError, TypeError, OverflowError, OSError) as e:
                 print(f"Skipping a slot for duration {duration_label} due to data processing error: {e}")
                 continue
 
@@ -98,95 +129,145 @@ def process_hubspot_availability(
     return transformed_availability
 
 
-def fetch_hubspot_meeting_availability(
-        hubspot_api_key: str,
+async def fetch_hubspot_meeting_availability(
+        auth_header: Dict[str, str],
         slug: str, timezone: str) -> Dict[str, Any]:
-    if not hubspot_api_key:
+    if not auth_header:
         raise ValueError("HUBSPOT_API_KEY is not provided internally.")
 
-    url = (f"https://api.hubapi.com"
-           f"/scheduler/v3/meetings/meeting-links/book/availability-page"
-           f"/{slug}?timezone={timezone}")
-    headers = {
-        "Accept": "application/json",
-        "Authorization": f"Bearer {hubspot_api_key}"
-    }
+    url = f"/scheduler/v3/meetings/meeting-links/book/availability-page/{slug}"
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()  # Raises HTTPError for 4xx/5xx responses
-        return response.json()
-    except requests.exceptions.HTTPError as errh:
+        response = await app.state.http.get(url, params={"timezone": timezone}, headers=auth_header)
+        response.raise_for_status()  # Raises HTTPStatusError for 4xx/5xx responses
+        return orjson.loads(response.content)
+    except httpx.HTTPStatusError as errh:
         # Logged by the caller if needed, re-raise to be handled by endpoint
         raise
-    except requests.exceptions.ConnectionError as errc:
-        raise ConnectionError(f"Network connection error to HubSpot: {errc}") from errc
-    except requests.exceptions.Timeout as errt:
+    except httpx.TimeoutException as errt:
         raise TimeoutError(f"Request to HubSpot timed out: {errt}") from errt
-    except requests.exceptions.JSONDecodeError as jerr:
+    except httpx.TransportError as errc:
+        raise ConnectionError(f"Network connection error to HubSpot: {errc}") from errc
+    except orjson.JSONDecodeError as jerr:
         # Log the response text if it's not JSON for debugging
-        response_text = ""
-        if 'response' in locals() and hasattr(response, 'text'):
-            response_text = response.text[:200]  # Log first 200 chars
+        response_text = response.text[:200]  # Log first 200 chars
         raise ValueError(f"Invalid JSON response from HubSpot. Response text (partial): {response_text}") from jerr
 
 
+async def _load_start_millis(
+        auth_header: Dict[str, str],
+        slug: str, timezone: str, raw_key: str) -> Dict[str, List[float]]:
+    generation = _availability_generations.get(slug, 0)
+    hubspot_data = await fetch_hubspot_meeting_availability(auth_header, slug, timezone)
+    start_millis_by_duration = extract_hubspot_start_millis(hubspot_data)
+    if _availability_generations.get(slug, 0) == generation:  # Stale if a booking landed mid-flight
+        _availability_cache[raw_key] = start_millis_by_duration
+    return start_millis_by_duration
+
+
+async def get_cached_availability(
+        auth_header: Dict[str, str],
+        slug: str, target_tz_obj: ZoneInfo,
+        apply_business_hours_filter: bool = APPLY_BUSINESS_HOURS_FILTER,
+        limit: Optional[int] = None) -> Dict[str, List[str]]:
+    timezone = target_tz_obj.key
+    raw_key = f"avail:{slug}:{timezone}"
+    processed_key = f"slots:{slug}:{timezone}:{apply_business_hours_filter}:{limit}"
+    cached = _processed_availability_cache.get(processed_key)
+    if cached is not None:
+        return cached
+
+    generation = _availability_generations.get(slug, 0)
+    start_millis_by_duration = _availability_cache.get(raw_key)
+    if start_millis_by_duration is None:
+        task = _inflight.get(raw_key)
+        if task is None:
+            task = asyncio.create_task(_load_start_millis(auth_header, slug, timezone, raw_key))
+            _inflight[raw_key] = task
+            # Only drop our own entry; invalidation may already have replaced it with a newer load
+            task.add_done_callback(lambda t: _inflight.pop(raw_key) if _inflight.get(raw_key) is t else None)
+        # Shielded so one client disconnecting doesn't cancel the load for everyone else waiting on it
+        start_millis_by_duration = await asyncio.shield(task)
+
+    processed = process_hubspot_availability(
+        start_millis_by_duration,
+        target_tz_obj,
+        apply_business_hours_filter=apply_business_hours_filter,
+        limit=limit
+    )
+    if _availability_generations.get(slug, 0) == generation:
+        _processed_availability_cache[processed_key] = processed
+    return processed
+
+
+def invalidate_cached_availability(slug: str) -> None:
+    _availability_generations[slug] = _availability_generations.get(slug, 0) + 1
+    # Forgetting in-flight loads makes later callers start a fresh one instead of joining a stale one
+    for cache, prefix in ((_availability_cache, f"avail:{slug}:"),
+                          (_processed_availability_cache, f"slots:{slug}:"),
+                          (_inflight, f"avail:{slug}:")):
+        for cache_key in [k for k in list(cache.keys()) if k.startswith(prefix)]:
+            cache.pop(cache_key, None)
+
+
 # --- FastAPI Application ---
 app = FastAPI(
     title="HubSpot Availability API",
     description="Provides meeting availability slots from HubSpot, transformed into a user-friendly format.",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 
 @app.on_event("startup")
 async def startup_event():
+    # One shared client so HubSpot calls reuse pooled connections and never block the event loop
+    app.state.http = httpx.AsyncClient(
+        base_url="https://api.hubapi.com",
+        timeout=10,
+        headers={"Accept": "application/json"},
+        # No custom transport: httpx only reads HTTPS_PROXY/HTTP_PROXY/NO_PROXY when it builds its own
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+    )
+    # Read the key and build the HubSpot headers once here instead of on every request
+    app.state.api_key = os.getenv("HUBSPOT_API_KEY")
+    app.state.auth_header = {"Authorization": f"Bearer {app.state.api_key}"} if app.state.api_key else {}
+    app.state.json_auth_header = {**app.state.auth_header, "Content-Type": "application/json"}
     # Optional: Check for HUBSPOT_API_KEY at startup to fail fast
-    if not os.getenv("HUBSPOT_API_KEY"):
+    if not app.state.api_key:
         print("FATAL: HUBSPOT_API_KEY environment variable not set. Application cannot function correctly.")
         # For a real deployment, you might exit here or have a health check fail
     print("Application startup: HubSpot Availability API is ready.")
     print(f"Default business hours filter (if applied): 9 AM - 5 PM, Mon-Fri.")
 
 
-@app.get("/availability",
-         response_model=Dict[str, List[str]],
-         summary="Get Meeting Availability",
-         description="Fetches availability for a HubSpot meeting link slug and returns formatted slots for the specified timezone."
-         )
-async def get_availability_endpoint(
-        slug: str = Query(..., min_length=1, description="The meeting link slug from HubSpot."),
-        timezone: str = Query("America/Mexico_City",
-                              description="Target timezone for displaying slots (e.g., 'America/New_York', 'Europe/London'). Must be an IANA timezone database name."),
-):
-    HUBSPOT_API_KEY_from_env = os.getenv("HUBSPOT_API_KEY")
-    if not HUBSPOT_API_KEY_from_env:
+@app.on_event("shutdown")
+async def shutdown_event():
+    await app.state.http.aclose()
+
+
+async def load_availability(
+        request: Request,
+        slug: str, timezone: str,
+        limit: Optional[int] = None) -> Dict[str, List[str]]:
+    # Shared by /availability and /availability/bulk; maps HubSpot failures to HTTPExceptions
+    if not request.app.state.api_key:
         raise HTTPException(status_code=500,
                             detail="Server configuration error: HUBSPOT_API_KEY not set.")
 
     # Validate timezone early
-    try:
-        pytz.timezone(timezone)
-    except pytz.exceptions.UnknownTimeZoneError:
+    target_tz_obj = get_tz(timezone)
+    if target_tz_obj is None:
         raise HTTPException(status_code=400,
                             detail=f"Invalid timezone provided: '{timezone}'. Please use a valid IANA timezone name.")
 
     try:
-        hubspot_data = fetch_hubspot_meeting_availability(HUBSPOT_API_KEY_from_env, slug, timezone)
-
-        transformed_data = process_hubspot_availability(
-            hubspot_data,
-            timezone,
-            # To make business hours configurable via API, add params here:
-            # business_start_hour=custom_start_hour_param,
-            # business_end_hour=custom_end_hour_param
-        )
+        # To make business hours configurable via API, add params here and to the cache key
+        transformed_data = await get_cached_availability(request.app.state.auth_header, slug, target_tz_obj, limit=limit)
 
-        # If transformed_data is empty (no slots available or all filtered out),
-        # FastAPI will correctly return an empty JSON object {} based on the response_model.
         return transformed_data
 
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         # Handle errors from HubSpot API (re-raised by fetch_hubspot_meeting_availability)
         status_code = e.response.status_code
         detail_message = f"Error from HubSpot API: Status {status_code} - {e.response.text[:200]}"  # Limit error text length
@@ -219,6 +300,58 @@ async def get_availability_endpoint(
         raise HTTPException(status_code=500, detail="An unexpected internal server error occurred.")
 
 
+# Responses are built directly with ORJSONResponse; `responses` only documents the shape in OpenAPI,
+# so the slot lists are not re-validated through a response_model on every request.
+@app.get("/availability",
+         responses={200: {"model": Dict[str, List[str]]}},
+         summary="Get Meeting Availability",
+         description="Fetches availability for a HubSpot meeting link slug and returns formatted slots for the specified timezone."
+         )
+async def get_availability_endpoint(
+        request: Request,
+        slug: str = Query(..., min_length=1, description="The meeting link slug from HubSpot."),
+        timezone: str = Query("America/Mexico_City",
+                              description="Target timezone for displaying slots (e.g., 'America/New_York', 'Europe/London'). Must be an IANA timezone database name."),
+        limit: Optional[int] = Query(None, gt=0, le=500,
+                                     description="Maximum number of slots to return per duration. Omit to return all slots."),
+):
+    # An empty dict (no slots available or all filtered out) is returned as {}
+    return ORJSONResponse(await load_availability(request, slug, timezone, limit))
+
+
+MAX_BULK_SLUGS = 20
+
+
+@app.get("/availability/bulk",
+         responses={200: {"model": Dict[str, Dict[str, List[str]]]}},
+         summary="Get Meeting Availability for Several Slugs",
+         description="Fetches availability for several HubSpot meeting link slugs concurrently and returns formatted slots keyed by slug. "
+                     "Use this instead of issuing one /availability call per slug."
+         )
+async def get_availability_bulk_endpoint(
+        request: Request,
+        slug: List[str] = Query(..., description="Meeting link slugs from HubSpot; repeat the parameter for each slug."),
+        timezone: str = Query("America/Mexico_City",
+                              description="Target timezone for displaying slots (e.g., 'America/New_York', 'Europe/London'). Must be an IANA timezone database name."),
+        limit: Optional[int] = Query(None, gt=0, le=500,
+                                     description="Maximum number of slots to return per duration. Omit to return all slots."),
+):
+    slugs = list(dict.fromkeys(s for s in slug if s))  # Drop blanks and duplicates, keep order
+    if not slugs:
+        raise HTTPException(status_code=400, detail="At least one non-empty slug is required.")
+    if len(slugs) > MAX_BULK_SLUGS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_SLUGS} slugs can be requested at once.")
+
+    # Each slug goes through the same path as /availability so caching and error mapping stay identical;
+    # the first failing slug fails the whole request.
+    results = await asyncio.gather(*(load_availability(request, s, timezone, limit) for s in slugs))
+    return ORJSONResponse(dict(zip(slugs, results)))
+
+
+# Matches slot labels produced by /availability, e.g. "Tuesday 2025-05-27 10:00"
+_SLOT_RE = re.compile(r"\S+\s+(\d{4})-(\d{2})-(\d{2})\s+(\d{2}):(\d{2})\s*")
+
+
 class BookingRequest(BaseModel):
     slug: str
     duration: str
@@ -234,34 +367,28 @@ class BookingRequest(BaseModel):
 @app.post("/book",
           summary="Book a Meeting",
           description="Books a meeting slot with the provided details via the HubSpot API.")
-async def book_meeting_endpoint(booking: BookingRequest):
-    HUBSPOT_API_KEY_from_env = os.getenv("HUBSPOT_API_KEY")
-    if not HUBSPOT_API_KEY_from_env:
+async def book_meeting_endpoint(request: Request, booking: BookingRequest):
+    if not request.app.state.api_key:
         raise HTTPException(status_code=500,
                             detail="Server configuration error: HUBSPOT_API_KEY not set.")
 
+    tz_obj = get_tz(booking.timezone)
+    if tz_obj is None:
+        raise HTTPException(status_code=400,
+                            detail=f"Invalid timezone provided: '{booking.timezone}'. Please use a valid IANA timezone name.")
+
     # Parse the slot time and convert to milliseconds
+    # Expected format: "Tuesday 2025-05-27 10:00"
+    slot_match = _SLOT_RE.fullmatch(booking.slot)
     try:
-        # Expected format: "Tuesday 2025-05-27 10:00"
-        slot_parts = booking.slot.split()
-        if len(slot_parts) < 3:
+        if slot_match is None:
             raise ValueError("Invalid slot format")
+        year, month, day, hour, minute = map(int, slot_match.groups())
 
-        date_str = slot_parts[1]
-        time_str = slot_parts[2]
-
-        # Parse the datetime
-        dt_str = f"{date_str} {time_str}"
-        dt_obj = datetime.strptime(dt_str, "%Y-%m-%d %H:%M")
-
-        # Create timezone aware datetime
-        tz_obj = pytz.timezone(booking.timezone)
-        local_dt = tz_obj.localize(dt_obj)
-
-        # Convert to UTC and then to milliseconds since epoch
-        utc_dt = local_dt.astimezone(pytz.UTC)
-        start_time_ms = int(utc_dt.timestamp() * 1000)
-    except (ValueError, IndexError) as e:
+        # Create timezone aware datetime directly; timestamp() is already UTC-based
+        local_dt = datetime(year, month, day, hour, minute, tzinfo=tz_obj)
+        start_time_ms = int(local_dt.timestamp() * 1000)
+    except ValueError:
         raise HTTPException(status_code=400,
                             detail=f"Invalid slot format: {booking.slot}. Expected format: 'Day YYYY-MM-DD HH:MM'")
 
@@ -288,50 +415,49 @@ async def book_meeting_endpoint(booking: BookingRequest):
     }
 
     # Send request to HubSpot API
-    url = "https://api.hubapi.com/scheduler/v3/meetings/meeting-links/book"
-    headers = {
-        "Authorization": f"Bearer {HUBSPOT_API_KEY_from_env}",
-        "Content-Type": "application/json"
-    }
+    url = "/scheduler/v3/meetings/meeting-links/book"
 
     try:
-        response = requests.post(
+        response = await app.state.http.post(
             url,
-            headers=headers,
-            data=json.dumps(hubspot_payload),
-            timeout=10
+            headers=request.app.state.json_auth_header,
+            content=orjson.dumps(hubspot_payload)
         )
         response.raise_for_status()  # Raises exception for 4XX/5XX responses
 
+        # The booked slot is gone, so don't keep serving it from the cache
+        invalidate_cached_availability(booking.slug)
+
         # Return the HubSpot API response
-        return response.json()
+        return orjson.loads(response.content)
 
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         status_code = e.response.status_code
-        error_detail = f"Error from HubSpot API: Status {status_code}"
+        if status_code == 401 or status_code == 403:
+            raise HTTPException(status_code=500, detail="HubSpot API authentication error")
 
+        error_detail = f"Error from HubSpot API: Status {status_code}"
+        # Only look at the start of the body; error payloads can be large or not JSON at all
+        error_body = e.response.content[:4096]
         try:
             # Try to parse error message from HubSpot
-            error_body = e.response.json()
-            if "message" in error_body:
-                error_detail += f" - {error_body['message']}"
-        except:
+            parsed_error = orjson.loads(error_body)
+            if isinstance(parsed_error, dict) and "message" in parsed_error:
+                error_detail += f" - {parsed_error['message']}"
+        except orjson.JSONDecodeError:
             # If can't parse JSON, just include part of the response text
-            error_detail += f" - {e.response.text[:200]}"
+            error_detail += f" - {error_body[:200].decode('utf-8', 'ignore')}"
 
-        if status_code == 401 or status_code == 403:
-            raise HTTPException(status_code=500, detail="HubSpot API authentication error")
-        else:
-            raise HTTPException(status_code=status_code, detail=error_detail)
+        raise HTTPException(status_code=status_code, detail=error_detail)
 
-    except requests.exceptions.ConnectionError as errc:
-        raise HTTPException(status_code=503,
-                            detail=f"Service unavailable: Could not connect to HubSpot")
-
-    except requests.exceptions.Timeout as errt:
+    except httpx.TimeoutException as errt:
         raise HTTPException(status_code=504,
                             detail=f"Request to HubSpot timed out")
 
+    except httpx.TransportError as errc:
+        raise HTTPException(status_code=503,
+                            detail=f"Service unavailable: Could not connect to HubSpot")
+
     except Exception as e:
         print(f"Unexpected error in /book endpoint: {type(e).__name__} - {e}")
         raise HTTPException(status_code=500,
@@ -366,16 +492,15 @@ async def echo_request(request: Request):
 
 
 # --- How to Run ---
-# 1. Save this code as `main.py` (or another name like `app.py`).
+# 1. This code lives in `api.py`; the commands below import it as `api:app`.
 # 2. Install dependencies:
-#    pip install fastapi "uvicorn[standard]" requests pytz
+#    pip install -r requirements.txt
 # 3. Set the HubSpot API Key environment variable:
 #    Linux/macOS: export HUBSPOT_API_KEY="your_actual_hubspot_HUBSPOT_API_KEY"
 #    Windows CMD: set HUBSPOT_API_KEY="your_actual_hubspot_HUBSPOT_API_KEY"
 #    Windows PowerShell: $env:HUBSPOT_API_KEY="your_actual_hubspot_HUBSPOT_API_KEY"
 # 4. Run the FastAPI application using Uvicorn:
-#    uvicorn main:app --reload
-#    (Replace `main` with your Python filename if you named it differently).
+#    uvicorn api:app --reload
 # 5. Access the API:
 #    - Endpoint: http://127.0.0.1:8000/availability?slug=your_slug&timezone=America/New_York
 #    - Echo Endpoint: http://127.0.0.1:8080/echo
@@ -383,9 +508,19 @@ async def echo_request(request: Request):
 #    - Alternative API docs (ReDoc): http://127.0.0.1:8080/redoc
 
 if __name__ == "__main__":
-    # This block allows running with `python main.py` if uvicorn is installed,
-    # but `uvicorn main:app --reload` is the recommended way for development.
+    # This block allows running with `python api.py` if uvicorn is installed,
+    # but `uvicorn api:app --reload` is the recommended way for development.
     import uvicorn
 
-    print("Attempting to run with Uvicorn. For development, prefer 'uvicorn main:app --reload'")
-    uvicorn.run(app, host="127.0.0.1", port=os.get_env("PORT", 8080), log_level="info")
\ No newline at end of file
+    print("Attempting to run with Uvicorn. For development, prefer 'uvicorn api:app --reload'")
+    # The availability caches live in each worker process, and /book only clears the worker that
+    # handled it, so other workers can serve a just-booked slot for up to AVAILABILITY_CACHE_TTL_SECONDS.
+    # Hence one worker by default; raise WEB_CONCURRENCY only if that staleness is acceptable.
+    # "auto" picks uvloop/httptools when installed and falls back to asyncio/h11 (e.g. on Windows).
+    uvicorn.run("api:app",
+                host="0.0.0.0",
+                port=int(os.getenv("PORT", "8080")),
+                loop="auto",
+                http="auto",
+                log_level="info",
+                workers=int(os.getenv("WEB_CONCURRENCY", "1")))
@@ -1,54 +1,202 @@
-import unittest
-import requests
-import os
-
-
-class TestAvailabilityEndpoint(unittest.TestCase):
-    def setUp(self):
-        self.base_url = os.getenv('API_BASE_URL', 'http://localhost:8000')
-
-        self.availability_endpoint = f"{self.base_url}/availability"
-        self.booking_endpoint = f"{self.base_url}/book"
-        self.echo_endpoint = f"{self.base_url}/echo"
-
-    def test_availability_endpoint_returns_success(self):
-        params = {
-            'slug': 'luis-pacheco',
-            'timezone': 'America/Mexico_City',
-        }
-        response = requests.get(self.availability_endpoint, params=params)
-
-        self.assertEqual(response.status_code, 200)
-        availability = response.json()
-        self.assertIsNotNone(availability)
-
-    def test_booking_endpoint_returns_success(self):
-        data = {
-            "slug": "luis-pacheco",
-            "slot": "Wednesday 2025-05-27 11:30",
-            "duration": "30min",
-            "timezone": "America/Mexico_City",
-            "firstName": "Robert",
-            "lastName": "Todea",
-            "country": "Mexico",
-            "company": "Mobile Insight",
-            "email": "rtodea@mobileinsight.com"
-        }
-        response = requests.post(self.booking_endpoint, json=data)
-
-        self.assertEqual(response.status_code, 200)
-        booking = response.json()
-        self.assertIsNotNone(booking)
-
-    def test_echo_endpoint_returns_success(self):
-
-        test_data = {"message": "test"}
-        response = requests.post(self.echo_endpoint, json=test_data)
-
-        self.assertEqual(response.status_code, 200)
-        echo_response = response.json()
-        self.assertEqual(echo_response['body'], test_data)
+import asyncio
+import sys
+
+import httpx
+import orjson
+import pytest
+
+import api
+from api_testdata import AVAILABILITY_PARAMS, HUBSPOT_AVAILABILITY, JSON_HEADERS
+
+BOOKING_REQUEST = {
+    "slug": "luis-pacheco",
+    "slot": "Tuesday 2025-05-27 10:30",
+    "duration": "30min",
+    "timezone": "America/Mexico_City",
+    "firstName": "Robert",
+    "lastName": "Todea",
+    "country": "Mexico",
+    "company": "Mobile Insight",
+    "email": "rtodea@mobileinsight.com"
+}
+# Request bodies are serialized once and posted as raw bytes
+BOOKING_BODY_JSON = orjson.dumps(BOOKING_REQUEST)
+ECHO_DATA = {"message": "test"}
+ECHO_BODY_JSON = orjson.dumps(ECHO_DATA)
+# (overrides merged into BOOKING_REQUEST, expected /book status)
+BOOKING_VARIANTS = [
+    pytest.param({}, 200, id="valid"),
+    pytest.param({"slot": "Tuesday 27/05/2025 10:30"}, 400, id="slot-format"),
+    pytest.param({"slot": "Friday 2025-02-30 10:30"}, 400, id="impossible-date"),
+    pytest.param({"slot": "Tuesday 2025-05-27 10:305"}, 400, id="slot-trailing-digit"),
+    pytest.param({"slot": "Tuesday 2025-05-27 10:30 garbage"}, 400, id="slot-trailing-text"),
+    pytest.param({"duration": "half an hour"}, 400, id="duration"),
+    pytest.param({"timezone": "Mars/Olympus_Mons"}, 400, id="timezone"),
+]
+
+
+def _json(response):
+    # orjson decodes the slot lists noticeably faster than the stdlib parser behind response.json()
+    return orjson.loads(response.content)
+
+
+# Shared checks: run in-process with HubSpot mocked, and against a live server with --run-integration
+
+def test_availability_endpoint_returns_success(api_client):
+    response = api_client.get("/availability", AVAILABILITY_PARAMS)
+
+    assert response.status_code == 200
+    assert _json(response) is not None
+
+
+def test_availability_bulk_endpoint_returns_success(api_client):
+    response = api_client.get("/availability/bulk", {**AVAILABILITY_PARAMS, 'slug': ['luis-pacheco']})
+
+    assert response.status_code == 200
+    assert 'luis-pacheco' in _json(response)
+
+
+def test_booking_endpoint_returns_success(api_client):
+    response = api_client.post("/book", BOOKING_BODY_JSON)
+
+    assert response.status_code == 200
+    assert _json(response) is not None
+
+
+def test_echo_endpoint_returns_success(api_client):
+    response = api_client.post("/echo", ECHO_BODY_JSON)
+
+    assert response.status_code == 200
+    assert _json(response)['body'] == ECHO_DATA
+
+
+# Mocked only: these inspect the calls the app made to HubSpot
+
+def test_availability_slots_are_formatted_in_target_timezone(mocked_api):
+    response = mocked_api.get("/availability", AVAILABILITY_PARAMS)
+
+    assert _json(response) == {"30min": ["Tuesday 2025-05-27 10:30", "Tuesday 2025-05-27 11:00"]}
+
+
+def test_repeated_availability_requests_are_served_from_cache(mocked_api, hubspot):
+    first = mocked_api.get("/availability", AVAILABILITY_PARAMS)
+    second = mocked_api.get("/availability", AVAILABILITY_PARAMS)
+
+    assert _json(second) == _json(first)
+    assert hubspot.routes["availability"].call_count == 1
+
+
+def test_booking_invalidates_cached_availability(mocked_api, hubspot):
+    mocked_api.get("/availability", AVAILABILITY_PARAMS)
+    mocked_api.post("/book", BOOKING_BODY_JSON)
+    mocked_api.get("/availability", AVAILABILITY_PARAMS)
+
+    assert hubspot.routes["availability"].call_count == 2
+
+
+def test_availability_limit_truncates_each_duration(mocked_api):
+    response = mocked_api.get("/availability", {**AVAILABILITY_PARAMS, 'limit': 1})
+
+    assert _json(response) == {"30min": ["Tuesday 2025-05-27 10:30"]}
+
+
+@pytest.mark.parametrize("limit", [0, 501])
+def test_availability_limit_out_of_range_is_rejected(mocked_api, limit):
+    response = mocked_api.get("/availability", {**AVAILABILITY_PARAMS, 'limit': limit})
+
+    assert response.status_code == 422
+
+
+def test_availability_bulk_collapses_duplicate_and_blank_slugs(mocked_api, hubspot):
+    params = {**AVAILABILITY_PARAMS, 'slug': ['luis-pacheco', '', 'luis-pacheco']}
+    response = mocked_api.get("/availability/bulk", params)
+
+    assert response.status_code == 200
+    assert list(_json(response)) == ['luis-pacheco']
+    assert hubspot.routes["availability"].call_count == 1
+
+
+def test_availability_bulk_rejects_too_many_slugs(mocked_api, hubspot):
+    params = {**AVAILABILITY_PARAMS, 'slug': [f"slug-{i}" for i in range(api.MAX_BULK_SLUGS + 1)]}
+    response = mocked_api.get("/availability/bulk", params)
+
+    assert response.status_code == 400
+    assert not hubspot.calls
+
+
+@pytest.mark.anyio
+async def test_concurrent_availability_misses_share_one_upstream_call(mocked_api, hubspot):
+    async def slow_availability(request):
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=HUBSPOT_AVAILABILITY)
+
+    hubspot.routes["availability"].side_effect = slow_availability
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://testserver") as client:
+        responses = await asyncio.gather(
+            *(client.get("/availability", params=AVAILABILITY_PARAMS) for _ in range(3)),
+            client.get("/availability", params={**AVAILABILITY_PARAMS, 'limit': 1}),
+        )
+
+    assert [r.status_code for r in responses] == [200] * 4
+    assert hubspot.routes["availability"].call_count == 1
+
+
+@pytest.mark.anyio
+async def test_booking_during_availability_load_is_not_overwritten_by_it(mocked_api, hubspot):
+    upstream_called, release_upstream = asyncio.Event(), asyncio.Event()
+
+    async def slow_availability(request):
+        upstream_called.set()
+        await release_upstream.wait()
+        return httpx.Response(200, json=HUBSPOT_AVAILABILITY)
+
+    hubspot.routes["availability"].side_effect = slow_availability
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://testserver") as client:
+        in_flight = asyncio.create_task(client.get("/availability", params=AVAILABILITY_PARAMS))
+        await upstream_called.wait()
+        await client.post("/book", content=BOOKING_BODY_JSON, headers=JSON_HEADERS)
+        release_upstream.set()
+        await in_flight
+        await client.get("/availability", params=AVAILABILITY_PARAMS)
+
+    assert hubspot.routes["availability"].call_count == 2
+
+
+@pytest.mark.parametrize("overrides, expected_status", BOOKING_VARIANTS)
+def test_booking_request_variants(mocked_api, overrides, expected_status):
+    body = BOOKING_BODY_JSON if not overrides else orjson.dumps({**BOOKING_REQUEST, **overrides})
+    response = mocked_api.post("/book", body)
+
+    assert response.status_code == expected_status
+
+
+def test_booking_sends_slot_to_hubspot(mocked_api, hubspot):
+    mocked_api.post("/book", BOOKING_BODY_JSON)
+
+    sent = hubspot.routes["book"].calls.last.request
+    assert sent.headers["Authorization"] == "Bearer test-key"
+    assert b'"startTime":"1748363400000"' in sent.content
+
+
+@pytest.mark.integration
+@pytest.mark.anyio
+async def test_availability_and_echo_concurrently(async_client_options):
+    # One client, both requests in flight at once: total time is roughly the slowest call, not the sum.
+    # /book is left out so the live run doesn't make the same real booking a second time.
+    async with httpx.AsyncClient(**async_client_options) as client:
+        try:
+            availability, echo = await asyncio.gather(
+                client.get("/availability", params=AVAILABILITY_PARAMS),
+                client.post("/echo", content=ECHO_BODY_JSON, headers=JSON_HEADERS),
+            )
+        except httpx.TimeoutException as e:
+            pytest.fail(f"endpoint exceeded SLO {client.timeout}: {e!r}")
+
+    assert availability.status_code == 200
+    assert _json(availability) is not None
+    assert echo.status_code == 200
+    assert _json(echo)['body'] == ECHO_DATA
 
 
 if __name__ == '__main__':
-    unittest.main()
+    sys.exit(pytest.main([__file__, *sys.argv[1:]]))
@@ -0,0 +1,23 @@
+# Constants shared by conftest.py and api_test.py; pytest doesn't support importing conftest as a module
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+AVAILABILITY_PARAMS = {
+    'slug': 'luis-pacheco',
+    'timezone': 'America/Mexico_City',
+}
+
+HUBSPOT_BASE_URL = "https://api.hubapi.com"
+HUBSPOT_AVAILABILITY_PATH = "/scheduler/v3/meetings/meeting-links/book/availability-page/luis-pacheco"
+HUBSPOT_BOOK_PATH = "/scheduler/v3/meetings/meeting-links/book"
+HUBSPOT_AVAILABILITY = {
+    "linkAvailability": {
+        "linkAvailabilityByDuration": {
+            "1800000": {
+                "availabilities": [
+                    {"startMillisUtc": 1748363400000, "endMillisUtc": 1748365200000},
+                    {"startMillisUtc": 1748365200000, "endMillisUtc": 1748367000000},
+                ]
+            }
+        }
+    }
+}
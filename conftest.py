@@ -0,0 +1,156 @@
+import os
+from contextlib import ExitStack
+from unittest import mock
+from urllib.parse import unquote, urlsplit
+
+import httpx
+import pytest
+import requests
+import respx
+from fastapi.testclient import TestClient
+from requests.adapters import HTTPAdapter
+
+import api
+from api_testdata import (AVAILABILITY_PARAMS, HUBSPOT_AVAILABILITY, HUBSPOT_AVAILABILITY_PATH,
+                          HUBSPOT_BASE_URL, HUBSPOT_BOOK_PATH, JSON_HEADERS)
+
+# (connect, read) seconds: a wedged server fails the test quickly instead of hanging the worker
+TIMEOUT = (1.0, 5.0)
+# Loopback bandwidth is free, so skip (de)compression by default; set e.g. "gzip, br" for remote servers
+ACCEPT_ENCODING = os.getenv('API_ACCEPT_ENCODING', 'identity')
+
+
+def pytest_addoption(parser):
+    parser.addoption("--run-integration", action="store_true", default=False,
+                     help="Also run tests marked 'integration', which call a live server at API_BASE_URL.")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "integration: calls a live API server; skipped unless --run-integration is given")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-integration"):
+        return
+    skip_integration = pytest.mark.skip(reason="needs --run-integration")
+    for item in items:
+        if "integration" in item.keywords:
+            item.add_marker(skip_integration)
+
+
+@pytest.fixture
+def anyio_backend():
+    # Async tests run through anyio's pytest plugin (installed with FastAPI) on plain asyncio
+    return "asyncio"
+
+
+class _MockedApi:
+    """The app in-process through TestClient; HubSpot is answered by the `hubspot` fixture."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, path, params):
+        return self.client.get(path, params=params)
+
+    def post(self, path, body):
+        return self.client.post(path, content=body, headers=JSON_HEADERS)
+
+
+class _LiveApi:
+    """A running server at API_BASE_URL, reached through one pooled session."""
+
+    def __init__(self, session, base_url):
+        self.session = session
+        self.base_url = base_url
+
+    def _request(self, method, path, **kwargs):
+        url = f"{self.base_url}{path}"
+        try:
+            return self.session.request(method, url, timeout=TIMEOUT, **kwargs)
+        except requests.Timeout as e:
+            pytest.fail(f"{method} {url} exceeded SLO {TIMEOUT}: {e}")
+
+    def get(self, path, params):
+        return self._request("GET", path, params=params)
+
+    def post(self, path, body):
+        return self._request("POST", path, data=body, headers=JSON_HEADERS)
+
+
+@pytest.fixture(scope="session")
+def base_url():
+    return os.getenv('API_BASE_URL', 'http://localhost:8000')
+
+
+@pytest.fixture(scope="session")
+def session(base_url):
+    # One pooled keep-alive session for the whole run instead of a new connection per call
+    session = requests.Session()
+    session.headers.update({"Connection": "keep-alive", "Accept-Encoding": ACCEPT_ENCODING})
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if base_url.startswith("http+unix://"):
+        # e.g. API_BASE_URL=http+unix://%2Ftmp%2Fhubspot.sock skips the loopback TCP stack entirely
+        import requests_unixsocket
+        session.mount("http+unix://", requests_unixsocket.UnixAdapter())
+
+    # Warm the server's availability cache and the pooled connection so tests measure steady state.
+    # Errors are left for the tests themselves to report.
+    try:
+        session.get(f"{base_url}/availability", params=AVAILABILITY_PARAMS, timeout=TIMEOUT)
+    except requests.RequestException:
+        pass
+
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="session")
+def test_client():
+    with ExitStack() as stack:
+        # The key only has to be set while the startup event reads it
+        with mock.patch.dict(os.environ, {"HUBSPOT_API_KEY": "test-key"}):
+            client = stack.enter_context(TestClient(api.app))
+        yield client
+
+
+@pytest.fixture
+def hubspot():
+    api._availability_cache.clear()
+    api._processed_availability_cache.clear()
+
+    with respx.mock(base_url=HUBSPOT_BASE_URL, assert_all_called=False) as router:
+        router.get(HUBSPOT_AVAILABILITY_PATH, name="availability").mock(
+            return_value=httpx.Response(200, json=HUBSPOT_AVAILABILITY))
+        router.post(HUBSPOT_BOOK_PATH, name="book").mock(
+            return_value=httpx.Response(200, json={"id": "123"}))
+        yield router
+
+
+@pytest.fixture
+def mocked_api(test_client, hubspot):
+    return _MockedApi(test_client)
+
+
+@pytest.fixture(scope="session")
+def live_api(session, base_url):
+    return _LiveApi(session, base_url)
+
+
+@pytest.fixture(params=["mocked", pytest.param("live", marks=pytest.mark.integration)])
+def api_client(request):
+    """Runs a test once in-process with HubSpot mocked and once against the live server."""
+    return request.getfixturevalue(f"{request.param}_api")
+
+
+@pytest.fixture
+def async_client_options(base_url):
+    timeout = httpx.Timeout(TIMEOUT[1], connect=TIMEOUT[0])
+    headers = {"Accept-Encoding": ACCEPT_ENCODING}
+    if base_url.startswith("http+unix://"):
+        # httpx takes the socket path on the transport and any host in the URL
+        return {"base_url": "http://localhost", "timeout": timeout, "headers": headers,
+                "transport": httpx.AsyncHTTPTransport(uds=unquote(urlsplit(base_url).netloc))}
+    return {"base_url": base_url, "timeout": timeout, "headers": headers, "http2": True}